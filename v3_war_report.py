@@ -1,22 +1,97 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import time
-from datetime import datetime
 import argparse
 import sys
 import os
 import configparser
 import logging
-from jinja2 import Environment, FileSystemLoader
+import re
+import hashlib
+import gzip
+import threading
+import functools
+from collections import deque
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from jinja2 import Environment, FileSystemLoader, TemplateNotFound
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Define constants for directories
 CACHE_DIR = 'cache'
 REPORTS_DIR = 'reports'
 
+# Environment variable that overrides the API key from the config file
+API_KEY_ENV_VAR = 'TORN_API_KEY'
+
+# Shared HTTP session so every API call reuses the same keep-alive connection
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=10,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=['GET'])
+))
+_SESSION.headers.update({
+    'User-Agent': 'torn-reporting/v3_war_report',
+    'Accept': 'application/json',
+    'Accept-Encoding': 'gzip'
+})
+
+# Matches the value of the 'key' query parameter so error messages never log the API key
+_API_KEY_PARAM_RE = re.compile(r'(?<=key=)[^&\s]+')
+
+# Attack logs are fetched in time windows of this size, several windows at a time
+ATTACK_WINDOW_SECONDS = 6 * 3600
+MAX_FETCH_WORKERS = 4
+
+# Torn allows 100 requests per minute per key; stay safely below that
+API_RATE_LIMIT = 80
+API_RATE_PERIOD = 60
+TORN_RATE_LIMIT_ERROR_CODE = 5
+MAX_RATE_LIMIT_BACKOFF = 60
+_request_times = deque()
+_request_times_lock = threading.Lock()
+
+# Finished wars never change; the key owner's profile is refreshed hourly in case they change faction
+WAR_DETAILS_CACHE_TTL = 30 * 86400
+PROFILE_CACHE_TTL = 3600
+
+# Processed member stats expire after a week; bump the version whenever process_war_data's output changes
+PROCESSED_CACHE_TTL = 7 * 86400
+PROCESSED_CACHE_VERSION = 1
+
+# Characters ignored and suffixes accepted when parsing money amounts such as "$1,500m" or "1b"
+_MONEY_CLEANUP_RE = re.compile(r'[\s,$_]')
+_MONEY_SUFFIXES = {'k': 1_000, 'm': 1_000_000, 'b': 1_000_000_000}
+# ASCII-only so digits like '²' that str.isdigit() accepts are rejected before reaching Decimal/int
+_WHOLE_NUMBER_RE = re.compile(r'\d+', re.ASCII)
+_DECIMAL_NUMBER_RE = re.compile(r'\d+(\.\d*)?|\.\d+', re.ASCII)
+
+# Characters stripped from (or replaced in) faction names before they go into report filenames
+_SAFE_FILENAME_TABLE = str.maketrans({' ': '_', '[': None, ']': None, '/': None, '\\': None, ':': None})
+
+# Reports are written through a large buffer so the streamed template hits the disk in few writes
+REPORT_WRITE_BUFFER_SIZE = 1 << 20
+
+# Jinja2 environment shared by all reports; templates are compiled once and kept
+_JINJA_ENV = None
+
 # --- Configuration ---
+@functools.lru_cache(maxsize=8)
+def _read_config_file(config_filename, mtime):
+    """Parses an .ini file; keyed on its modification time so edits are picked up."""
+    config_parser = configparser.ConfigParser()
+    config_parser.read(config_filename)
+    return config_parser
+
 def get_config(config_filename="v3_config.ini"):
     """Reads configuration from a given .ini file and returns it as a dictionary."""
-    config_parser = configparser.ConfigParser()
     config = {
         'api_key': None,
         'faction_share_default': '30',
@@ -24,14 +99,21 @@ def get_config(config_filename="v3_config.ini"):
         'presets': {}
     }
 
+    env_key = os.environ.get(API_KEY_ENV_VAR, '').strip()
+
     if not os.path.exists(config_filename):
+        if env_key:
+            config['api_key'] = env_key
+            return config
         logging.error(f"{config_filename} file not found. Please create it.")
         return None
 
-    config_parser.read(config_filename)
+    config_parser = _read_config_file(config_filename, os.path.getmtime(config_filename))
 
-    # Read API Key
-    if 'TornAPI' in config_parser and 'ApiKey' in config_parser['TornAPI']:
+    # Read API Key (the environment variable takes precedence over the .ini file)
+    if env_key:
+        config['api_key'] = env_key
+    elif 'TornAPI' in config_parser and 'ApiKey' in config_parser['TornAPI']:
         key = config_parser['TornAPI']['ApiKey']
         if key and key.strip() and key != 'YourActualApiKeyHere':
             config['api_key'] = key
@@ -55,24 +137,61 @@ def get_config(config_filename="v3_config.ini"):
     return config
 
 # --- Utility Functions ---
-def get_unique_filename(base_path):
-    """Checks if a file exists and returns a unique name by appending a number."""
-    if not os.path.exists(base_path):
+def dump_json_bytes(data):
+    """Serializes data to compact JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+def load_json_bytes(raw):
+    """Parses JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+@functools.lru_cache(maxsize=4096)
+def _fmt_ts(timestamp):
+    """Formats a Unix timestamp as local 'YYYY-MM-DD HH:MM:SS', memoized since the same values recur."""
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
+
+def get_unique_filename(base_path, taken_names=()):
+    """Checks if a file exists and returns a unique name by appending a number, also skipping taken_names."""
+    directory, filename = os.path.split(base_path)
+
+    # List the directory once instead of stat'ing every candidate name
+    try:
+        with os.scandir(directory or '.') as entries:
+            existing_names = {entry.name for entry in entries}
+    except FileNotFoundError:
+        existing_names = set()
+    existing_names.update(taken_names)
+
+    if filename not in existing_names:
         return base_path
 
-    directory, filename = os.path.split(base_path)
     name, ext = os.path.splitext(filename)
 
     counter = 2
-    while True:
-        new_name = f"{name}_{counter}{ext}"
-        new_path = os.path.join(directory, new_name)
-        if not os.path.exists(new_path):
-            return new_path
+    while f"{name}_{counter}{ext}" in existing_names:
         counter += 1
+    return os.path.join(directory, f"{name}_{counter}{ext}")
+
+def parse_money(value):
+    """Parses amounts like '1,000,000', '$500m' or '1.5b' into an integer, raising ValueError if invalid."""
+    cleaned = _MONEY_CLEANUP_RE.sub('', str(value)).lower()
+    multiplier = _MONEY_SUFFIXES.get(cleaned[-1:], 1)
+    if multiplier > 1:
+        # Suffixed amounts may use a decimal point, e.g. 1.5b
+        cleaned = cleaned[:-1]
+        pattern = _DECIMAL_NUMBER_RE
+    else:
+        pattern = _WHOLE_NUMBER_RE
+    if not pattern.fullmatch(cleaned):
+        raise ValueError(f"Invalid amount: {value!r}")
+    return int(Decimal(cleaned) * multiplier)
 
-def prompt_for_numeric_input(prompt_message, default=None):
-    """Prompts the user for numeric input, allowing an optional default value."""
+def prompt_for_numeric_input(prompt_message, default=None, allow_money=False):
+    """Prompts the user for numeric input, allowing an optional default value and, for amounts, k/m/b suffixes."""
     while True:
         prompt_suffix = f" (default: {default})" if default is not None else ""
         user_input = input(f"{prompt_message}{prompt_suffix}: ")
@@ -80,67 +199,153 @@ def prompt_for_numeric_input(prompt_message, default=None):
         if user_input.strip() == "" and default is not None:
             return str(default)
 
+        if allow_money:
+            try:
+                return str(parse_money(user_input))
+            except ValueError:
+                logging.warning("Invalid input. Please enter a whole number (k, m and b suffixes are allowed) or press Enter to use the default.")
+            continue
+
         cleaned_input = user_input.replace(',', '').replace('$', '').strip()
 
-        if cleaned_input.isdigit():
+        if _WHOLE_NUMBER_RE.fullmatch(cleaned_input):
             return cleaned_input
         else:
             logging.warning("Invalid input. Please enter a whole number or press Enter to use the default.")
 
 # --- API Fetching Functions ---
-def get_api_data(url):
-    """Fetches data from a given Torn API URL."""
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        if 'error' in data:
-            logging.error(f"API Error: {data['error']['error']}")
-            return None
-        return data
-    except requests.exceptions.RequestException as e:
-        logging.error(f"An HTTP error occurred: {e}")
-        return None
-    except ValueError:
-        logging.error("Error decoding JSON from response.")
-        return None
+class AttackFetchError(Exception):
+    """Raised when a page of attack logs could not be fetched, which would leave a gap in the war."""
 
-def get_war_details(war_id, api_key):
-    """Fetches the details of a specific ranked war."""
-    logging.info(f"Fetching details for War ID: {war_id}...")
-    url = f"https://api.torn.com/torn/{war_id}?selections=rankedwarreport&key={api_key}"
-    return get_api_data(url)
+def wait_for_rate_limit():
+    """Blocks only as long as needed to keep requests within the rolling rate-limit window."""
+    while True:
+        with _request_times_lock:
+            now = time.monotonic()
+            while _request_times and now - _request_times[0] >= API_RATE_PERIOD:
+                _request_times.popleft()
+            if len(_request_times) < API_RATE_LIMIT:
+                _request_times.append(now)
+                return
+            wait_time = API_RATE_PERIOD - (now - _request_times[0])
+        time.sleep(wait_time)
+
+def get_api_data(url, params=None):
+    """Fetches data from a given Torn API URL, backing off if the rate limit is hit."""
+    backoff = 2
+    while True:
+        wait_for_rate_limit()
+        try:
+            response = _SESSION.get(url, params=params, timeout=(5, 30))
+            response.raise_for_status()
+            data = load_json_bytes(response.content)
+            if 'error' in data:
+                if data['error'].get('code') == TORN_RATE_LIMIT_ERROR_CODE and backoff <= MAX_RATE_LIMIT_BACKOFF:
+                    logging.warning("API rate limit reached. Retrying in %d seconds...", backoff)
+                    time.sleep(backoff)
+                    backoff *= 2
+                    continue
+                logging.error("API Error: %s", data['error']['error'])
+                return None
+            return data
+        except requests.exceptions.RequestException as e:
+            logging.error("An HTTP error occurred: %s", _API_KEY_PARAM_RE.sub('***', str(e)))
+            return None
+        except ValueError:
+            logging.error("Error decoding JSON from response.")
+            return None
 
-def get_all_attacks(faction_id, start_timestamp, end_timestamp, api_key):
-    """Fetches all faction attacks within a given timeframe."""
-    start_str = datetime.fromtimestamp(start_timestamp).strftime('%Y-%m-%d %H:%M:%S')
-    end_str = datetime.fromtimestamp(end_timestamp).strftime('%Y-%m-%d %H:%M:%S')
-    logging.info(f"Fetching all attack logs from {start_str} to {end_str}...")
-    all_attacks = []
-    current_from = start_timestamp
-
-    while current_from < end_timestamp:
-        url = f"https://api.torn.com/faction/{faction_id}?selections=attacks&from={current_from}&to={end_timestamp}&key={api_key}"
-        data = get_api_data(url)
+def get_war_details(war_id, api_key, use_cache=True):
+    """Fetches the details of a specific ranked war, reusing a cached copy if available."""
+    cache_path = os.path.join(CACHE_DIR, f"v3_war_details_cache_{war_id}.json")
+    if use_cache:
+        cached = load_json_cache(cache_path, WAR_DETAILS_CACHE_TTL)
+        if cached is not None:
+            logging.info("Loaded details for War ID %s from cache.", war_id)
+            return cached
+
+    logging.info("Fetching details for War ID: %s...", war_id)
+    data = get_api_data(f"https://api.torn.com/torn/{war_id}", params={'selections': 'rankedwarreport', 'key': api_key})
+    # Only a finished war's report is final, so only cache once it has an end time
+    if data and data.get('rankedwarreport', {}).get('war', {}).get('end'):
+        save_json_cache(cache_path, data)
+    return data
+
+def get_user_profile(api_key, use_cache=True):
+    """Fetches the profile of the API key's owner, reusing a recent cached copy if available."""
+    # Cache per key without writing the key itself to disk
+    key_hash = hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+    cache_path = os.path.join(CACHE_DIR, f"v3_profile_cache_{key_hash}.json")
+    if use_cache:
+        cached = load_json_cache(cache_path, PROFILE_CACHE_TTL)
+        if cached is not None:
+            logging.info("Loaded user profile from cache.")
+            return cached
+
+    data = get_api_data("https://api.torn.com/user/", params={'selections': 'profile', 'key': api_key})
+    if data and 'faction' in data:
+        save_json_cache(cache_path, data)
+    return data
+
+def _fetch_attack_window(faction_id, window_start, window_end, api_key):
+    """Fetches all faction attacks within a single time window, following pagination."""
+    window_attacks = []
+    current_from = window_start
+
+    # Only 'from' changes between pages, so the URL and the fixed parameters are built once
+    base_url = f"https://api.torn.com/faction/{faction_id}"
+    base_params = {'selections': 'attacks', 'to': window_end, 'key': api_key}
+    while current_from < window_end:
+        data = get_api_data(base_url, params={**base_params, 'from': current_from})
         if data and 'attacks' in data:
-            attacks_chunk = list(data['attacks'].values())
-            if not attacks_chunk:
+            attacks_page = data['attacks']
+            if not attacks_page:
                 break
-            all_attacks.extend(attacks_chunk)
+            window_attacks.extend(attacks_page.values())
 
-            last_timestamp = attacks_chunk[-1]['timestamp_ended']
+            last_timestamp = window_attacks[-1]['timestamp_ended']
             if last_timestamp > current_from:
                  current_from = last_timestamp
             else:
                  break
-            logging.info(f"Fetched {len(attacks_chunk)} attacks, advancing to timestamp {current_from}")
-            time.sleep(3)
+            logging.info("Fetched %d attacks, advancing to %s", len(attacks_page), _fmt_ts(current_from))
         else:
-            break
+            # Stopping here would silently drop the rest of the window, so fail the whole fetch instead
+            raise AttackFetchError(f"Could not fetch attacks from {_fmt_ts(current_from)} to {_fmt_ts(window_end)}")
+
+    return window_attacks
+
+def get_all_attacks(faction_id, start_timestamp, end_timestamp, api_key):
+    """Fetches all faction attacks within a given timeframe, or returns None if any part of it failed."""
+    logging.info("Fetching all attack logs from %s to %s...", _fmt_ts(start_timestamp), _fmt_ts(end_timestamp))
+
+    # Split the timeframe into windows that are paginated concurrently
+    windows = [
+        (window_start, min(window_start + ATTACK_WINDOW_SECONDS, end_timestamp))
+        for window_start in range(start_timestamp, end_timestamp, ATTACK_WINDOW_SECONDS)
+    ]
+    # De-duplicate by attack code as results arrive (windows overlap at their edges)
+    unique_attacks = []
+    seen_codes = set()
+    total_fetched = 0
+    with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as executor:
+        futures = [executor.submit(_fetch_attack_window, faction_id, lo, hi, api_key) for lo, hi in windows]
+        try:
+            for future in futures:
+                for attack in future.result():
+                    total_fetched += 1
+                    code = attack['code']
+                    if code not in seen_codes:
+                        seen_codes.add(code)
+                        unique_attacks.append(attack)
+        except AttackFetchError as e:
+            for future in futures:
+                future.cancel()
+            logging.error("%s. The attack log would be incomplete, so nothing is cached.", e)
+            return None
 
-    logging.info(f"Finished fetching. Total attacks: {len(all_attacks)}")
-    unique_attacks = list({attack['code']: attack for attack in all_attacks}.values())
-    logging.info(f"Unique attacks after de-duplication: {len(unique_attacks)}")
+    logging.info("Finished fetching. Total attacks: %d", total_fetched)
+    logging.info("Unique attacks after de-duplication: %d", len(unique_attacks))
     return unique_attacks
 
 # --- Data Processing Functions ---
@@ -180,41 +385,44 @@ def process_war_data(war_report, all_attacks, our_faction_id):
     if all_attacks:
         offensive_hits = 0
         defensive_hits = 0
-        for attack in all_attacks:
-            if attack.get('ranked_war') != 1:
-                continue
-
-            attacker_id_str = str(attack.get('attacker_id'))
-            defender_id_str = str(attack.get('defender_id'))
-
-            is_offensive = (attack.get('attacker_faction') == our_faction_id and
-                            attack.get('defender_faction') == opponent_faction_id)
-
-            if is_offensive and attacker_id_str in member_stats:
+        # The API gives member IDs as ints in attacks but as string keys in the war report;
+        # an int-keyed view avoids building a str() for every attack
+        get_member_stats = {int(mid): stats for mid, stats in member_stats.items()}.get
+        # Attacks fetched from the margins around the war are mostly not ranked-war hits; drop them up front
+        ranked_attacks = [attack for attack in all_attacks if attack.get('ranked_war') == 1]
+        for attack in ranked_attacks:
+            attacker_faction = attack.get('attacker_faction')
+            defender_faction = attack.get('defender_faction')
+
+            # Look each member's stats up once per attack and update them in place
+            if attacker_faction == our_faction_id and defender_faction == opponent_faction_id:
+                stats = get_member_stats(attack.get('attacker_id'))
+                if stats is None:
+                    continue
                 offensive_hits += 1
-                member_stats[attacker_id_str]['hits_made'] += 1
+                stats['hits_made'] += 1
                 respect_gain = float(attack.get('respect_gain', 0.0))
-                member_stats[attacker_id_str]['respect_gained'] += respect_gain
+                stats['respect_gained'] += respect_gain
 
-                chain_bonus = float(attack.get('modifiers', {}).get('chain_bonus', 1.0) or 1.0)
-                base_respect = respect_gain / chain_bonus
-                member_stats[attacker_id_str]['base_respect_gained'] += base_respect
+                modifiers = attack.get('modifiers')
+                chain_bonus = float((modifiers.get('chain_bonus') if modifiers else None) or 1.0)
+                stats['base_respect_gained'] += respect_gain / chain_bonus
 
                 if attack.get('result') == 'Assist':
-                    member_stats[attacker_id_str]['assists'] += 1
-
-            is_defensive = (attack.get('defender_faction') == our_faction_id and
-                            attack.get('attacker_faction') == opponent_faction_id)
+                    stats['assists'] += 1
 
-            if is_defensive and defender_id_str in member_stats:
+            elif defender_faction == our_faction_id and attacker_faction == opponent_faction_id:
+                stats = get_member_stats(attack.get('defender_id'))
+                if stats is None:
+                    continue
                 defensive_hits += 1
                 result = attack.get('result')
                 if result == 'Lost':
-                    member_stats[defender_id_str]['hits_taken'] += 1
+                    stats['hits_taken'] += 1
                 elif result == 'Stalemate':
-                    member_stats[defender_id_str]['stalemates'] += 1
+                    stats['stalemates'] += 1
                 else:
-                    member_stats[defender_id_str]['defends'] += 1
+                    stats['defends'] += 1
 
         logging.info(f"Processed {offensive_hits} offensive attacks and {defensive_hits} defensive actions.")
 
@@ -233,7 +441,7 @@ def calculate_final_payouts(settings, member_stats, prize_total_str, faction_sha
     logging.info("Calculating final payouts based on settings...")
 
     try:
-        prize_total = int(str(prize_total_str).replace(',', '').replace('$', '').strip())
+        prize_total = parse_money(prize_total_str)
         faction_share_percent = int(faction_share_str)
         guaranteed_share_percent = int(guaranteed_share_str)
     except (ValueError, TypeError):
@@ -245,12 +453,12 @@ def calculate_final_payouts(settings, member_stats, prize_total_str, faction_sha
     assist_payment_value = int(settings.get('assist_payment_value', '0'))
     penalty_per_hit_taken = int(settings.get('penalty_per_hit_taken', '0'))
 
-    member_data = dict(member_stats)
-    if not member_data:
+    # member_stats is a list of (member_id, stats) pairs; the stats dicts are updated in place
+    if not member_stats:
         logging.warning("No member data to calculate payouts for.")
         return []
 
-    participant_count = len(member_data)
+    participant_count = len(member_stats)
 
     faction_take = prize_total * (faction_share_percent / 100)
     member_pool = prize_total - faction_take
@@ -260,8 +468,14 @@ def calculate_final_payouts(settings, member_stats, prize_total_str, faction_sha
 
     adjustable_pool = member_pool - guaranteed_pool
 
-    total_assists = sum(stats['assists'] for stats in member_data.values())
-    total_hits_taken = sum(stats['hits_taken'] for stats in member_data.values())
+    respect_key = 'respect_gained' if use_bonus_respect else 'base_respect_gained'
+
+    # Gather every total the pools depend on in one walk over the members
+    total_assists = total_hits_taken = total_respect_to_share = 0
+    for _, stats in member_stats:
+        total_assists += stats['assists']
+        total_hits_taken += stats['hits_taken']
+        total_respect_to_share += stats[respect_key]
 
     total_assist_payout = 0
     if assist_payment_type == 'flat':
@@ -274,10 +488,7 @@ def calculate_final_payouts(settings, member_stats, prize_total_str, faction_sha
         logging.warning(f"Participation pool is negative (${participation_pool:,.2f}). Payouts from respect share will be zero.")
         participation_pool = 0
 
-    respect_key = 'respect_gained' if use_bonus_respect else 'base_respect_gained'
-    total_respect_to_share = sum(stats[respect_key] for stats in member_data.values())
-
-    for _, stats in member_data.items():
+    for _, stats in member_stats:
         stats['guaranteed_payout'] = guaranteed_payout_per_member
         stats['penalty_amount'] = stats['hits_taken'] * penalty_per_hit_taken
 
@@ -293,53 +504,124 @@ def calculate_final_payouts(settings, member_stats, prize_total_str, faction_sha
         stats['respect_payout'] = stats['guaranteed_payout'] + stats['participation_payout']
         stats['final_payout'] = stats['respect_payout'] + stats['adjustments']
 
-    sorted_member_data = sorted(member_data.items(), key=lambda item: item[1]['final_payout'], reverse=True)
+    sorted_member_data = sorted(member_stats, key=lambda item: item[1]['final_payout'], reverse=True)
 
     logging.info("Finished calculating payouts.")
     return sorted_member_data
 
+# --- Cache Functions ---
+def load_json_cache(cache_path, max_age):
+    """Returns the cached JSON data if the file exists and is newer than max_age seconds, otherwise None."""
+    try:
+        if time.time() - os.path.getmtime(cache_path) > max_age:
+            return None
+        with open(cache_path, 'rb') as f:
+            return load_json_bytes(f.read())
+    except (json.JSONDecodeError, OSError):
+        return None
+
+def save_json_cache(cache_path, data):
+    """Writes data to a JSON cache file."""
+    with open(cache_path, 'wb') as f:
+        f.write(dump_json_bytes(data))
+
+def load_processed_cache(cache_path, war_report):
+    """Loads the payout-independent member stats cached by a recent run with the current format, or returns None."""
+    cached = load_json_cache(cache_path, PROCESSED_CACHE_TTL)
+    if cached is None:
+        return None
+    if not isinstance(cached, dict) or cached.get('version') != PROCESSED_CACHE_VERSION:
+        logging.info(f"Processed cache {cache_path} was written by an older version. Reprocessing attack data.")
+        return None
+    try:
+        processed_data = {
+            'war_details': war_report.get('rankedwarreport', {}),
+            'member_stats': [tuple(item) for item in cached['member_stats']],
+            'our_faction_name': cached['our_faction_name'],
+            'opponent_faction_name': cached['opponent_faction_name']
+        }
+    except (KeyError, TypeError) as e:
+        logging.warning(f"Could not read processed cache file {cache_path}: {e}. Reprocessing attack data.")
+        return None
+    logging.info(f"Loaded processed member stats from cache: {cache_path}")
+    return processed_data
+
+def save_processed_cache(cache_path, processed_data):
+    """Caches the payout-independent part of the processed war data for later runs."""
+    cached = {key: processed_data[key] for key in ('member_stats', 'our_faction_name', 'opponent_faction_name')}
+    cached['version'] = PROCESSED_CACHE_VERSION
+    logging.info(f"Saving processed member stats to cache: {cache_path}")
+    save_json_cache(cache_path, cached)
+
 # --- HTML Generation Functions ---
+def get_template(template_name):
+    """Returns a compiled Jinja2 template, creating the shared environment on first use."""
+    global _JINJA_ENV
+    if _JINJA_ENV is None:
+        _JINJA_ENV = Environment(loader=FileSystemLoader('.'), autoescape=True, auto_reload=False, cache_size=-1)
+    return _JINJA_ENV.get_template(template_name)
+
+def write_report(template, context, report_path):
+    """Streams the rendered template into a new, uniquely named file and returns its path."""
+    # Claim the filename atomically and move to the next suffix if it is taken. A name that fails is
+    # never retried: on case-insensitive filesystems the listing and open() can disagree.
+    tried_names = set()
+    while True:
+        unique_filename = get_unique_filename(report_path, tried_names)
+        try:
+            report_file = open(unique_filename, "xb", buffering=REPORT_WRITE_BUFFER_SIZE)
+            break
+        except FileExistsError:
+            tried_names.add(os.path.basename(unique_filename))
+
+    # Stream the rendered template straight to disk instead of building the whole page in memory
+    try:
+        with report_file:
+            template.stream(context).dump(report_file, encoding="utf-8")
+    except Exception:
+        # Don't leave a truncated report behind under the claimed name
+        os.remove(unique_filename)
+        raise
+    return unique_filename
+
 def generate_war_report_html(processed_data, war_id, prize_total, faction_share, guaranteed_share):
     """Generates the final simple HTML report file using a Jinja2 template."""
     if not processed_data or not processed_data.get('member_stats'):
         logging.warning("No participating members found with respect gained. Report generation skipped.")
         return
 
-    env = Environment(loader=FileSystemLoader('.'))
     try:
-        template = env.get_template('v3_report_template.html')
-    except FileNotFoundError:
+        template = get_template('v3_report_template.html')
+    except TemplateNotFound:
         logging.error("v3_report_template.html not found in the script's directory.")
         return
 
     member_stats = processed_data['member_stats']
-    total_respect_payout = sum(stats.get('respect_payout', 0) for _, stats in member_stats)
-    total_adjustments = sum(stats.get('adjustments', 0) for _, stats in member_stats)
-    total_final_payout = sum(stats.get('final_payout', 0) for _, stats in member_stats)
+    total_respect_gained = total_respect_payout = total_adjustments = total_final_payout = 0
+    for _, stats in member_stats:
+        total_respect_gained += stats['respect_gained']
+        total_respect_payout += stats.get('respect_payout', 0)
+        total_adjustments += stats.get('adjustments', 0)
+        total_final_payout += stats.get('final_payout', 0)
 
     war_details = processed_data['war_details']
     context = {
         'war_id': war_id,
         'our_faction_name': processed_data['our_faction_name'],
         'opponent_faction_name': processed_data['opponent_faction_name'],
-        'start_str': datetime.fromtimestamp(war_details['war']['start']).strftime('%Y-%m-%d %H:%M:%S'),
-        'end_str': datetime.fromtimestamp(war_details['war']['end']).strftime('%Y-%m-%d %H:%M:%S'),
+        'start_str': _fmt_ts(war_details['war']['start']),
+        'end_str': _fmt_ts(war_details['war']['end']),
         'member_stats': member_stats,
-        'total_respect_gained': sum(stats['respect_gained'] for _, stats in member_stats),
+        'total_respect_gained': total_respect_gained,
         'total_respect_payout': total_respect_payout,
         'total_adjustments': total_adjustments,
         'total_final_payout': total_final_payout
     }
 
-    html_content = template.render(context)
-
-    opponent_name_safe = processed_data['opponent_faction_name'].replace(' ', '_').replace('[', '').replace(']', '')
+    opponent_name_safe = processed_data['opponent_faction_name'].translate(_SAFE_FILENAME_TABLE)
     base_filename = f"v3_war_report_{war_id}_{opponent_name_safe}.html"
     report_path = os.path.join(REPORTS_DIR, base_filename)
-    unique_filename = get_unique_filename(report_path)
-
-    with open(unique_filename, "w", encoding="utf-8") as f:
-        f.write(html_content)
+    unique_filename = write_report(template, context, report_path)
     logging.info(f"Successfully generated simple report: {unique_filename}")
 
 
@@ -349,48 +631,48 @@ def generate_advanced_report_html(processed_data, war_id):
         logging.warning("No data for advanced report. Generation skipped.")
         return
 
-    env = Environment(loader=FileSystemLoader('.'))
     try:
-        template = env.get_template('v3_advanced_report_template.html')
-    except FileNotFoundError:
+        template = get_template('v3_advanced_report_template.html')
+    except TemplateNotFound:
         logging.error("v3_advanced_report_template.html not found in the script's directory.")
         return
 
     member_stats = processed_data['member_stats']
 
-    # Calculate totals for all columns
-    totals = {
-        key: sum(stats.get(key, 0) for _, stats in member_stats)
-        for key in ['hits_made', 'defends', 'assists', 'hits_taken', 'stalemates', 'respect_gained',
-                    'guaranteed_payout', 'participation_payout', 'assist_payout', 'penalty_amount', 'final_payout']
-    }
+    # Calculate totals for all columns and find the top hitter in a single pass
+    total_keys = ('hits_made', 'defends', 'assists', 'hits_taken', 'stalemates', 'respect_gained',
+                  'guaranteed_payout', 'participation_payout', 'assist_payout', 'penalty_amount', 'final_payout')
+    totals = dict.fromkeys(total_keys, 0)
+    top_hitter = ('', {'name': 'N/A', 'hits_made': 0})
+    top_hits = -1
+    for item in member_stats:
+        stats = item[1]
+        for key in total_keys:
+            totals[key] += stats.get(key, 0)
+        if stats['hits_made'] > top_hits:
+            top_hits = stats['hits_made']
+            top_hitter = item
 
     # Find top performers
     top_earner_stats = member_stats[0][1] if member_stats else {'name': 'N/A', 'final_payout': 0}
-    top_hitter = max(member_stats, key=lambda item: item[1]['hits_made']) if member_stats else ('', {'name': 'N/A', 'hits_made': 0})
 
     war_details = processed_data['war_details']
     context = {
         'war_id': war_id,
         'our_faction_name': processed_data['our_faction_name'],
         'opponent_faction_name': processed_data['opponent_faction_name'],
-        'start_str': datetime.fromtimestamp(war_details['war']['start']).strftime('%Y-%m-%d %H:%M:%S'),
-        'end_str': datetime.fromtimestamp(war_details['war']['end']).strftime('%Y-%m-%d %H:%M:%S'),
+        'start_str': _fmt_ts(war_details['war']['start']),
+        'end_str': _fmt_ts(war_details['war']['end']),
         'member_stats': member_stats,
         'totals': totals,
         'top_earner': {'name': top_earner_stats['name'], 'payout': top_earner_stats['final_payout']},
         'top_hitter': {'name': top_hitter[1]['name'], 'hits': top_hitter[1]['hits_made']}
     }
 
-    html_content = template.render(context)
-
-    opponent_name_safe = processed_data['opponent_faction_name'].replace(' ', '_').replace('[', '').replace(']', '')
+    opponent_name_safe = processed_data['opponent_faction_name'].translate(_SAFE_FILENAME_TABLE)
     base_filename = f"v3_advanced_report_{war_id}_{opponent_name_safe}.html"
     report_path = os.path.join(REPORTS_DIR, base_filename)
-    unique_filename = get_unique_filename(report_path)
-
-    with open(unique_filename, "w", encoding="utf-8") as f:
-        f.write(html_content)
+    unique_filename = write_report(template, context, report_path)
     logging.info(f"Successfully generated advanced report: {unique_filename}")
 
 
@@ -432,11 +714,11 @@ Usage Examples:
 """
     )
     parser.add_argument('war_id', nargs='?', default=None, help='The ranked war ID. Required for non-interactive mode.')
-    parser.add_argument('-p', '--prize-total', type=str, help='The total prize money for the war (e.g., 1000000000).')
+    parser.add_argument('-p', '--prize-total', type=str, help='The total prize money for the war (e.g., 1000000000, 1,000,000,000 or 1b).')
     parser.add_argument('-f', '--faction-share', type=str, help=f"The percentage of the prize the faction keeps. Default: {config['faction_share_default']}%%")
     parser.add_argument('-g', '--guaranteed-share', type=str, help=f"The percentage of the member pool for guaranteed payouts. Default: {config['guaranteed_share_default']}%%")
     parser.add_argument('--preset', type=str, help='The name of the payout preset to use from config.ini (e.g., Preset_Standard).')
-    parser.add_argument('--no-cache', action='store_true', help='Ignore existing cache and fetch fresh attack data from the API.')
+    parser.add_argument('--no-cache', action='store_true', help='Ignore existing caches, fetch fresh attack data from the API and reprocess it.')
 
     args = parser.parse_args()
 
@@ -452,17 +734,17 @@ Usage Examples:
         logging.info("No War ID provided. Entering interactive mode.")
         war_id = prompt_for_numeric_input("Please enter the Ranked War ID")
         logging.info("Please provide payout details (press Enter to use defaults):")
-        prize_total = prompt_for_numeric_input("Prize Total", default="0")
+        prize_total = prompt_for_numeric_input("Prize Total", default="0", allow_money=True)
         faction_share = prompt_for_numeric_input("Faction Share %", default=config['faction_share_default'])
         guaranteed_share = prompt_for_numeric_input("Guaranteed Share %", default=config['guaranteed_share_default'])
 
     # --- Start processing and API calls ---
-    war_report = get_war_details(war_id, API_KEY)
+    war_report = get_war_details(war_id, API_KEY, use_cache=not args.no_cache)
     if not war_report or 'rankedwarreport' not in war_report:
         logging.error("Could not fetch war report. Check the War ID and API key.")
         sys.exit(1)
 
-    user_data = get_api_data(f"https://api.torn.com/user/?selections=profile&key={API_KEY}")
+    user_data = get_user_profile(API_KEY, use_cache=not args.no_cache)
     if not user_data or 'faction' not in user_data or user_data['faction']['faction_id'] == 0:
         logging.error("Could not determine your faction ID from the API key provided.")
         sys.exit(1)
@@ -471,32 +753,48 @@ Usage Examples:
     war_start_time = war_report['rankedwarreport']['war']['start']
     war_end_time = war_report['rankedwarreport']['war']['end']
 
-    # --- Caching logic for attack logs ---
-    cache_file_path = os.path.join(CACHE_DIR, f"v3_war_hits_cache_{war_id}.json")
-    all_attacks = None
-
-    if not args.no_cache and os.path.exists(cache_file_path):
-        logging.info(f"Loading attack data from cache: {cache_file_path}")
-        try:
-            with open(cache_file_path, 'r', encoding='utf-8') as f:
-                all_attacks = json.load(f)
-            logging.info(f"Successfully loaded {len(all_attacks)} unique attacks from cache.")
-        except (json.JSONDecodeError, IOError) as e:
-            logging.warning(f"Could not read cache file {cache_file_path}: {e}. Refetching from API.")
-            all_attacks = None
-
-    if all_attacks is None:
-        logging.info("Cache not found or invalid. Fetching attacks from API...")
-        fetch_start_time = war_start_time - 330
-        fetch_end_time = war_end_time + 330
-        all_attacks = get_all_attacks(our_faction_id, fetch_start_time, fetch_end_time, API_KEY)
-
-        if all_attacks:
-            logging.info(f"Saving attack data to cache: {cache_file_path}")
-            with open(cache_file_path, 'w', encoding='utf-8') as f:
-                json.dump(all_attacks, f, indent=4)
-
-    processed_data = process_war_data(war_report, all_attacks, our_faction_id)
+    # --- Caching logic for processed member stats ---
+    processed_cache_path = os.path.join(CACHE_DIR, f"v3_processed_cache_{war_id}_{our_faction_id}.json")
+    processed_data = None if args.no_cache else load_processed_cache(processed_cache_path, war_report)
+
+    if processed_data is None:
+        # --- Caching logic for attack logs ---
+        # Attack logs are stored gzipped; the uncompressed file is still read if that is all there is
+        legacy_cache_path = os.path.join(CACHE_DIR, f"v3_war_hits_cache_{war_id}.json")
+        cache_file_path = legacy_cache_path + '.gz'
+        all_attacks = None
+
+        if not args.no_cache:
+            existing_cache_path = next((path for path in (cache_file_path, legacy_cache_path) if os.path.exists(path)), None)
+            if existing_cache_path:
+                logging.info(f"Loading attack data from cache: {existing_cache_path}")
+                opener = gzip.open if existing_cache_path.endswith('.gz') else open
+                try:
+                    with opener(existing_cache_path, 'rb') as f:
+                        all_attacks = load_json_bytes(f.read())
+                    logging.info(f"Successfully loaded {len(all_attacks)} unique attacks from cache.")
+                except (json.JSONDecodeError, IOError, EOFError) as e:
+                    logging.warning(f"Could not read cache file {existing_cache_path}: {e}. Refetching from API.")
+                    all_attacks = None
+
+        if all_attacks is None:
+            logging.info("Cache not found or invalid. Fetching attacks from API...")
+            fetch_start_time = war_start_time - 330
+            fetch_end_time = war_end_time + 330
+            all_attacks = get_all_attacks(our_faction_id, fetch_start_time, fetch_end_time, API_KEY)
+            if all_attacks is None:
+                logging.error("Could not fetch the complete attack log. No report was generated.")
+                sys.exit(1)
+
+            if all_attacks:
+                logging.info(f"Saving attack data to cache: {cache_file_path}")
+                with gzip.open(cache_file_path, 'wb', compresslevel=3) as f:
+                    f.write(dump_json_bytes(all_attacks))
+
+        processed_data = process_war_data(war_report, all_attacks, our_faction_id)
+
+        if processed_data and all_attacks:
+            save_processed_cache(processed_cache_path, processed_data)
 
     if processed_data:
         # --- Payout Calculation ---
@@ -519,8 +817,21 @@ Usage Examples:
             processed_data['member_stats'] = calculated_stats
 
         # --- Report Generation ---
-        generate_war_report_html(processed_data, war_id, prize_total, faction_share, guaranteed_share)
-        generate_advanced_report_html(processed_data, war_id)
+        # Compile both templates up front so the report threads only read the shared Jinja2 cache
+        for template_name in ('v3_report_template.html', 'v3_advanced_report_template.html'):
+            try:
+                get_template(template_name)
+            except TemplateNotFound:
+                pass  # Reported by the generator itself
+
+        # The two reports are independent, so render and write them concurrently
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            report_futures = [
+                executor.submit(generate_war_report_html, processed_data, war_id, prize_total, faction_share, guaranteed_share),
+                executor.submit(generate_advanced_report_html, processed_data, war_id)
+            ]
+            for future in report_futures:
+                future.result()
 
 if __name__ == '__main__':
     main()
@@ -1,36 +1,117 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import atexit
 import json
 import time
-from datetime import datetime
 import argparse
 import sys
 import os
 import configparser
 import logging
-from jinja2 import Environment, FileSystemLoader
+import math
+import re
+import threading
+import hashlib
+import functools
+import operator
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from jinja2 import Environment, FileSystemLoader, TemplateNotFound
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# urllib3 can only decode brotli responses when the brotli package is installed
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 # Define constants for directories
 CACHE_DIR = 'cache'
 REPORTS_DIR = 'reports'
 
+# Environment variable that overrides the API key from the config file
+API_KEY_ENV_VAR = 'TORN_API_KEY'
+
+# One HTTP session for all API calls so the connection to api.torn.com is kept alive between requests
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=['GET'])
+))
+_SESSION.headers.update({
+    'User-Agent': 'torn-reporting/war_report',
+    'Accept': 'application/json',
+    'Accept-Encoding': 'gzip, deflate, br' if brotli is not None else 'gzip, deflate'
+})
+atexit.register(_SESSION.close)
+
+# Matches the value of the 'key' query parameter so error messages never log the API key
+_API_KEY_PARAM_RE = re.compile(r'(?<=key=)[^&\s]+')
+
+# Finished wars never change; the key owner's profile is refreshed hourly in case they change faction
+WAR_DETAILS_CACHE_TTL = 30 * 86400
+PROFILE_CACHE_TTL = 3600
+
+# The report's JavaScript reads the prize total with every non-digit stripped; ASCII-only to match JS's \D
+_NON_DIGIT_RE = re.compile(r'\D', re.ASCII)
+
+# Reports are written through a large buffer so the streamed template hits the disk in few writes
+REPORT_WRITE_BUFFER_SIZE = 1 << 20
+
+# Jinja2 environment shared by all reports; templates are compiled once and kept
+_JINJA_ENV = None
+
+# Attack logs are fetched in time windows of this size, several windows at a time
+ATTACK_WINDOW_SECONDS = 6 * 3600
+MAX_FETCH_WORKERS = 4
+# The faction attacks selection returns at most this many attacks per call
+ATTACKS_PAGE_SIZE = 100
+
+# Torn allows 100 requests per minute per key; stay safely below that
+API_RATE_LIMIT = 80
+API_RATE_PERIOD = 60
+TORN_RATE_LIMIT_ERROR_CODE = 5
+MAX_RATE_LIMIT_BACKOFF = 60
+_request_times = deque()
+_request_times_lock = threading.Lock()
+
 # --- Configuration ---
+@functools.lru_cache(maxsize=8)
+def _read_config_file(config_filename, mtime_ns):
+    """Parses an .ini file; keyed on its modification time so edits are picked up."""
+    config_parser = configparser.ConfigParser()
+    config_parser.read(config_filename)
+    return config_parser
+
 def get_config():
     """Reads configuration from config.ini and returns it as a dictionary."""
-    config_parser = configparser.ConfigParser()
     config = {
         'api_key': None,
         'faction_share_default': '30',
         'guaranteed_share_default': '10'
     }
 
+    env_key = os.environ.get(API_KEY_ENV_VAR, '').strip()
+
     if not os.path.exists('config.ini'):
+        if env_key:
+            config['api_key'] = env_key
+            return config
         logging.error("config.ini file not found. Please create it.")
         return None
 
-    config_parser.read('config.ini')
+    config_parser = _read_config_file('config.ini', os.stat('config.ini').st_mtime_ns)
 
-    # Read API Key
-    if 'TornAPI' in config_parser and 'ApiKey' in config_parser['TornAPI']:
+    # Read API Key (the environment variable takes precedence over config.ini)
+    if env_key:
+        config['api_key'] = env_key
+    elif 'TornAPI' in config_parser and 'ApiKey' in config_parser['TornAPI']:
         key = config_parser['TornAPI']['ApiKey']
         if key and key.strip() and key != 'YourActualApiKeyHere':
             config['api_key'] = key
@@ -49,21 +130,44 @@ def get_config():
     return config
 
 # --- Utility Functions ---
-def get_unique_filename(base_path):
-    """Checks if a file exists and returns a unique name by appending a number."""
-    if not os.path.exists(base_path):
-        return base_path
-    
+def dump_json_bytes(data):
+    """Serializes data to compact JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+def load_json_bytes(raw):
+    """Parses JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+@functools.lru_cache(maxsize=4096)
+def _fmt_ts(timestamp):
+    """Formats a Unix timestamp as local 'YYYY-MM-DD HH:MM:SS', memoized since the same values recur."""
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
+
+def get_unique_filename(base_path, taken_names=()):
+    """Checks if a file exists and returns a unique name by appending a number, also skipping taken_names."""
     directory, filename = os.path.split(base_path)
+
+    # List the directory once instead of stat'ing every candidate name
+    try:
+        with os.scandir(directory or '.') as entries:
+            existing_names = {entry.name for entry in entries}
+    except FileNotFoundError:
+        existing_names = set()
+    existing_names.update(taken_names)
+
+    if filename not in existing_names:
+        return base_path
+
     name, ext = os.path.splitext(filename)
-    
+
     counter = 2
-    while True:
-        new_name = f"{name}_{counter}{ext}"
-        new_path = os.path.join(directory, new_name)
-        if not os.path.exists(new_path):
-            return new_path
+    while f"{name}_{counter}{ext}" in existing_names:
         counter += 1
+    return os.path.join(directory, f"{name}_{counter}{ext}")
 
 def prompt_for_numeric_input(prompt_message, default=None):
     """Prompts the user for numeric input, allowing an optional default value."""
@@ -82,122 +186,323 @@ def prompt_for_numeric_input(prompt_message, default=None):
             logging.warning("Invalid input. Please enter a whole number or press Enter to use the default.")
 
 # --- API Fetching Functions ---
-def get_api_data(url):
-    """Fetches data from a given Torn API URL."""
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        if 'error' in data:
-            logging.error(f"API Error: {data['error']['error']}")
-            return None
-        return data
-    except requests.exceptions.RequestException as e:
-        logging.error(f"An HTTP error occurred: {e}")
-        return None
-    except ValueError:
-        logging.error("Error decoding JSON from response.")
-        return None
+class AttackFetchError(Exception):
+    """Raised when a page of attack logs could not be fetched, which would leave a gap in the war."""
 
-def get_war_details(war_id, api_key):
-    """Fetches the details of a specific ranked war."""
-    logging.info(f"Fetching details for War ID: {war_id}...")
-    url = f"https://api.torn.com/torn/{war_id}?selections=rankedwarreport&key={api_key}"
-    return get_api_data(url)
+def wait_for_rate_limit():
+    """Blocks only as long as needed to keep requests within the rolling rate-limit window."""
+    while True:
+        with _request_times_lock:
+            now = time.monotonic()
+            while _request_times and now - _request_times[0] >= API_RATE_PERIOD:
+                _request_times.popleft()
+            if len(_request_times) < API_RATE_LIMIT:
+                _request_times.append(now)
+                return
+            wait_time = API_RATE_PERIOD - (now - _request_times[0])
+        time.sleep(wait_time)
+
+def get_api_data(url, params=None):
+    """Fetches data from a given Torn API URL (with optional query params), backing off if the rate limit is hit."""
+    backoff = 2
+    while True:
+        wait_for_rate_limit()
+        try:
+            response = _SESSION.get(url, params=params, timeout=(5, 30))
+            response.raise_for_status()
+            data = load_json_bytes(response.content)
+            if 'error' in data:
+                if data['error'].get('code') == TORN_RATE_LIMIT_ERROR_CODE and backoff <= MAX_RATE_LIMIT_BACKOFF:
+                    logging.warning("API rate limit reached. Retrying in %d seconds...", backoff)
+                    time.sleep(backoff)
+                    backoff *= 2
+                    continue
+                logging.error("API Error: %s", data['error']['error'])
+                return None
+            return data
+        except requests.exceptions.RequestException as e:
+            logging.error("An HTTP error occurred: %s", _API_KEY_PARAM_RE.sub('***', str(e)))
+            return None
+        except ValueError:
+            logging.error("Error decoding JSON from response.")
+            return None
 
-def get_all_attacks(faction_id, start_timestamp, end_timestamp, api_key):
-    """Fetches all faction attacks within a given timeframe."""
-    start_str = datetime.fromtimestamp(start_timestamp).strftime('%Y-%m-%d %H:%M:%S')
-    end_str = datetime.fromtimestamp(end_timestamp).strftime('%Y-%m-%d %H:%M:%S')
-    logging.info(f"Fetching all attack logs from {start_str} to {end_str}...")
-    all_attacks = []
-    current_from = start_timestamp
-
-    while current_from < end_timestamp:
-        url = f"https://api.torn.com/faction/{faction_id}?selections=attacks&from={current_from}&to={end_timestamp}&key={api_key}"
-        data = get_api_data(url)
+def get_war_details(war_id, api_key, use_cache=True):
+    """Fetches the details of a specific ranked war, reusing a cached copy if available."""
+    cache_path = os.path.join(CACHE_DIR, f"war_details_cache_{war_id}.json")
+    if use_cache:
+        cached = load_json_cache(cache_path, WAR_DETAILS_CACHE_TTL)
+        if cached is not None:
+            logging.info("Loaded details for War ID %s from cache.", war_id)
+            return cached
+
+    logging.info("Fetching details for War ID: %s...", war_id)
+    data = get_api_data(f"https://api.torn.com/torn/{war_id}", params={'selections': 'rankedwarreport', 'key': api_key})
+    # Only a finished war's report is final, so only cache once it has an end time
+    if data and data.get('rankedwarreport', {}).get('war', {}).get('end'):
+        save_json_cache(cache_path, data)
+    return data
+
+def get_user_profile(api_key, use_cache=True):
+    """Fetches the profile of the API key's owner, reusing a recent cached copy if available."""
+    # Cache per key without writing the key itself to disk
+    key_hash = hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+    cache_path = os.path.join(CACHE_DIR, f"profile_cache_{key_hash}.json")
+    if use_cache:
+        cached = load_json_cache(cache_path, PROFILE_CACHE_TTL)
+        if cached is not None:
+            logging.info("Loaded user profile from cache.")
+            return cached
+
+    data = get_api_data("https://api.torn.com/user/", params={'selections': 'profile', 'key': api_key})
+    if data and 'faction' in data:
+        save_json_cache(cache_path, data)
+    return data
+
+def _fetch_attack_window(faction_id, window_start, window_end, api_key):
+    """Fetches all faction attacks within a single time window, following pagination."""
+    window_attacks = []
+    current_from = window_start
+    base_url = f"https://api.torn.com/faction/{faction_id}"
+    base_params = {'selections': 'attacks', 'to': window_end, 'key': api_key}
+
+    while current_from < window_end:
+        data = get_api_data(base_url, params={**base_params, 'from': current_from})
         if data and 'attacks' in data:
-            attacks_chunk = list(data['attacks'].values())
-            if not attacks_chunk:
+            attacks_page = data['attacks']
+            if not attacks_page:
+                break
+            window_attacks.extend(attacks_page.values())
+
+            # A short page is the last one; don't spend a request just to get an empty page back
+            if len(attacks_page) < ATTACKS_PAGE_SIZE:
+                logging.info("Fetched %d attacks, reached the end of the window", len(attacks_page))
                 break
-            all_attacks.extend(attacks_chunk)
 
-            last_timestamp = attacks_chunk[-1]['timestamp_ended']
+            last_timestamp = window_attacks[-1]['timestamp_ended']
             if last_timestamp > current_from:
                  current_from = last_timestamp
             else:
                  break
-            logging.info(f"Fetched {len(attacks_chunk)} attacks, advancing to timestamp {current_from}")
-            time.sleep(3)
+            logging.info("Fetched %d attacks, advancing to timestamp %d", len(attacks_page), current_from)
         else:
-            break
+            # Stopping here would silently drop the rest of the window, so fail the whole fetch instead
+            raise AttackFetchError(f"Could not fetch attacks from {_fmt_ts(current_from)} to {_fmt_ts(window_end)}")
+
+    return window_attacks
 
-    logging.info(f"Finished fetching. Total attacks: {len(all_attacks)}")
-    unique_attacks = list({attack['code']: attack for attack in all_attacks}.values())
-    logging.info(f"Unique attacks after de-duplication: {len(unique_attacks)}")
-    return unique_attacks
+def get_all_attacks(faction_id, start_timestamp, end_timestamp, api_key):
+    """Fetches all faction attacks within a given timeframe, or returns None if any part of it failed."""
+    logging.info("Fetching all attack logs from %s to %s...", _fmt_ts(start_timestamp), _fmt_ts(end_timestamp))
+
+    # Split the timeframe into windows that are paginated concurrently
+    windows = [
+        (window_start, min(window_start + ATTACK_WINDOW_SECONDS, end_timestamp))
+        for window_start in range(start_timestamp, end_timestamp, ATTACK_WINDOW_SECONDS)
+    ]
+    # De-duplicate by attack code as results arrive (windows overlap at their edges)
+    unique_attacks = {}
+    total_fetched = 0
+    with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as executor:
+        futures = [executor.submit(_fetch_attack_window, faction_id, lo, hi, api_key) for lo, hi in windows]
+        try:
+            for future in futures:
+                for attack in future.result():
+                    total_fetched += 1
+                    unique_attacks[attack['code']] = attack
+        except AttackFetchError as e:
+            for future in futures:
+                future.cancel()
+            logging.error("%s. The attack log would be incomplete, so nothing is cached.", e)
+            return None
+
+    logging.info("Finished fetching. Total attacks: %d", total_fetched)
+    logging.info("Unique attacks after de-duplication: %d", len(unique_attacks))
+    return list(unique_attacks.values())
 
 # --- Data Processing Functions ---
 def process_war_data(war_report, all_attacks, our_faction_id):
     """Processes the raw API data to calculate member contributions."""
     logging.info("Processing war data...")
     war_data = war_report.get('rankedwarreport', {})
+    # Faction IDs are compared as ints against the attack logs, so normalize once here
+    our_faction_id = int(our_faction_id)
 
     factions = war_data.get('factions', {})
-    opponent_faction_id = None
-    for fid, details in factions.items():
-        if int(fid) != our_faction_id:
-            opponent_faction_id = int(fid)
-            break
+    faction_ids = (int(fid) for fid in factions)
+    opponent_faction_id = next((fid for fid in faction_ids if fid != our_faction_id), None)
 
     if not opponent_faction_id:
         logging.error("Could not determine opponent faction.")
         return None
 
-    member_stats = {}
+    # Keyed by int member ID, matching the attacker IDs in the attack logs. Attackers who are no
+    # longer in the faction get an entry on first sight and take their name from that attack.
     our_members_in_war = war_data.get('members', {}).get(str(our_faction_id), {})
-    for member_id, member_details in our_members_in_war.items():
-        member_stats[member_id] = {'respect_gained': 0, 'name': member_details.get('name', 'Unknown')}
+    member_stats = defaultdict(
+        lambda: {'respect_gained': 0, 'name': None},
+        {int(member_id): {'respect_gained': 0, 'name': member_details.get('name', 'Unknown')}
+         for member_id, member_details in our_members_in_war.items()}
+    )
 
     if all_attacks:
+        # Fetch all needed fields in one C-level call; attacks missing any of them are skipped
+        get_attack_fields = operator.itemgetter('ranked_war', 'attacker_faction', 'defender_faction', 'attacker_id', 'respect_gain')
+        our_hit_on_opponent = (our_faction_id, opponent_faction_id)
         for attack in all_attacks:
-            is_our_attack = (attack.get('attacker_faction') == our_faction_id and
-                             attack.get('defender_faction') == opponent_faction_id)
-            is_ranked_war_attack = attack.get('ranked_war') == 1
-
-            if is_our_attack and is_ranked_war_attack:
-                attacker_id = str(attack['attacker_id'])
-                respect_gain = attack.get('respect_gain', 0)
-
-                if attacker_id in member_stats:
-                    member_stats[attacker_id]['respect_gained'] += respect_gain
-                else:
-                    member_stats[attacker_id] = {'respect_gained': respect_gain, 'name': attack.get('attacker_name', 'Unknown (Ex-member)')}
-
-    active_members = {mid: stats for mid, stats in member_stats.items() if stats['respect_gained'] > 0}
-    sorted_stats = sorted(active_members.items(), key=lambda item: item[1]['respect_gained'], reverse=True)
+            try:
+                ranked_war, attacker_faction, defender_faction, attacker_id, respect_gain = get_attack_fields(attack)
+            except KeyError:
+                continue
+            if ranked_war != 1 or (attacker_faction, defender_faction) != our_hit_on_opponent:
+                continue
+
+            stats = member_stats[attacker_id]
+            stats['respect_gained'] += respect_gain
+            if stats['name'] is None:
+                stats['name'] = attack.get('attacker_name', 'Unknown (Ex-member)')
+
+    # Collect active members and their combined respect in the same pass
+    active_members = []
+    total_respect = 0
+    for mid, stats in member_stats.items():
+        if stats['respect_gained'] > 0:
+            active_members.append((mid, stats))
+            total_respect += stats['respect_gained']
+    sorted_stats = sorted(active_members, key=lambda item: item[1]['respect_gained'], reverse=True)
 
     return {
         'war_details': war_data,
         'member_stats': sorted_stats,
+        'total_respect': total_respect,
         'our_faction_name': factions.get(str(our_faction_id), {}).get('name', 'Your Faction'),
         'opponent_faction_name': factions.get(str(opponent_faction_id), {}).get('name', 'Opponent')
     }
 
+def _parse_share(value):
+    """Parses a share percentage as a float, treating anything invalid as 0.
+
+    This matches the page's parseFloat() for the plain numbers the report is given,
+    but not for inputs the two read differently, such as '30abc' or '1_0'.
+    """
+    try:
+        share = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    # float() also accepts 'nan', 'inf' and overflowing values like '1e400'; none of them is a usable share
+    return share if math.isfinite(share) else 0.0
+
+def _js_round(value):
+    """Rounds half up like JavaScript's Math.round, so server-side payouts match the page's own."""
+    return math.floor(value + 0.5)
+
+def calculate_initial_payouts(member_stats, prize_total, faction_share, guaranteed_share):
+    """Computes the payouts the report shows on load, mirroring calculatePayouts() in the template.
+
+    Per-member values are stored on each member's stats; the column totals are returned.
+    """
+    # The page works from the respect values as printed and the prize total with all non-digits stripped
+    respect_values = [float('%.2f' % stats['respect_gained']) for _, stats in member_stats]
+    total_respect = sum(respect_values)
+    participant_count = len(member_stats)
+
+    prize = float(_NON_DIGIT_RE.sub('', str(prize_total)) or 0)
+    if not math.isfinite(prize):
+        # A digit string too long for a float overflows to inf; treat it as invalid like any other bad prize
+        prize = 0.0
+    faction_take = prize * (_parse_share(faction_share) / 100)
+    member_pool = prize - faction_take
+    guaranteed_pool = member_pool * (_parse_share(guaranteed_share) / 100)
+    participation_pool = member_pool - guaranteed_pool
+
+    guaranteed_payout = guaranteed_pool / participant_count if participant_count > 0 else 0
+    totals = {'guaranteed': 0, 'participation': 0}
+    for (_, stats), respect in zip(member_stats, respect_values):
+        respect_share = respect / total_respect if total_respect > 0 else 0
+        participation_payout = participation_pool * respect_share
+        stats['guaranteed_payout'] = _js_round(guaranteed_payout)
+        stats['participation_payout'] = _js_round(participation_payout)
+        stats['total_prize'] = _js_round(guaranteed_payout + participation_payout)
+        totals['guaranteed'] += stats['guaranteed_payout']
+        totals['participation'] += stats['participation_payout']
+
+    totals['payout'] = totals['guaranteed'] + totals['participation']
+    return totals
+
+# --- Cache Functions ---
+def load_json_cache(cache_path, max_age):
+    """Returns the cached JSON data if the file exists and is newer than max_age seconds, otherwise None."""
+    try:
+        if time.time() - os.path.getmtime(cache_path) > max_age:
+            return None
+        with open(cache_path, 'rb') as f:
+            return load_json_bytes(f.read())
+    except (json.JSONDecodeError, OSError):
+        return None
+
+def save_json_cache(cache_path, data):
+    """Writes data to a JSON cache file."""
+    with open(cache_path, 'wb') as f:
+        f.write(dump_json_bytes(data))
+
+def load_attack_cache(cache_path, faction_id, fetch_start, fetch_end):
+    """Returns cached attacks if the cache was fetched for this faction and covers the window, otherwise None."""
+    if not os.path.exists(cache_path):
+        return None
+
+    logging.info(f"Loading attack data from cache: {cache_path}")
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = load_json_bytes(f.read())
+    except (json.JSONDecodeError, IOError) as e:
+        logging.warning(f"Could not read cache file {cache_path}: {e}. Refetching from API.")
+        return None
+
+    # Caches written before the fetch window was recorded are a bare list of attacks
+    if isinstance(cached, list):
+        attacks = cached
+    elif (isinstance(cached, dict) and 'attacks' in cached
+            and cached.get('faction_id') == faction_id
+            and cached.get('fetch_start', float('inf')) <= fetch_start
+            and cached.get('fetch_end', 0) >= fetch_end):
+        attacks = cached['attacks']
+    else:
+        logging.warning(f"Cache file {cache_path} was fetched for a different faction or time window. Refetching from API.")
+        return None
+
+    logging.info(f"Successfully loaded {len(attacks)} unique attacks from cache.")
+    return attacks
+
+def save_attack_cache(cache_path, faction_id, fetch_start, fetch_end, attacks):
+    """Writes the fetched attacks to disk together with the window they were fetched for."""
+    logging.info(f"Saving attack data to cache: {cache_path}")
+    cached = {'faction_id': faction_id, 'fetch_start': fetch_start, 'fetch_end': fetch_end, 'attacks': attacks}
+    with open(cache_path, 'wb') as f:
+        f.write(dump_json_bytes(cached))
+
 # --- HTML Generation Functions ---
+def get_template(template_name):
+    """Returns a compiled, auto-escaping Jinja2 template, creating the shared environment on first use."""
+    global _JINJA_ENV
+    if _JINJA_ENV is None:
+        _JINJA_ENV = Environment(loader=FileSystemLoader('.'), autoescape=True, auto_reload=False, cache_size=-1)
+    return _JINJA_ENV.get_template(template_name)
+
 def generate_war_report_html(processed_data, war_id, prize_total, faction_share, guaranteed_share):
     """Generates the final HTML report file using a Jinja2 template."""
     if not processed_data or not processed_data.get('member_stats'):
         logging.warning("No participating members found with respect gained. Report generation skipped.")
         return
 
-    env = Environment(loader=FileSystemLoader('.'))
     try:
-        template = env.get_template('report_template.html')
-    except FileNotFoundError:
+        template = get_template('report_template.html')
+    except TemplateNotFound:
         logging.error("report_template.html not found in the script's directory.")
         return
 
+    # Render the initial payouts server-side so the page is complete before its script runs
+    payout_totals = calculate_initial_payouts(processed_data['member_stats'], prize_total, faction_share, guaranteed_share)
+
     war_details = processed_data['war_details']
     context = {
         'war_id': war_id,
@@ -206,21 +511,35 @@ def generate_war_report_html(processed_data, war_id, prize_total, faction_share,
         'guaranteed_share': guaranteed_share,
         'our_faction_name': processed_data['our_faction_name'],
         'opponent_faction_name': processed_data['opponent_faction_name'],
-        'start_str': datetime.fromtimestamp(war_details['war']['start']).strftime('%Y-%m-%d %H:%M:%S'),
-        'end_str': datetime.fromtimestamp(war_details['war']['end']).strftime('%Y-%m-%d %H:%M:%S'),
+        'start_str': _fmt_ts(war_details['war']['start']),
+        'end_str': _fmt_ts(war_details['war']['end']),
         'member_stats': processed_data['member_stats'],
-        'total_respect_gained': sum(stats['respect_gained'] for _, stats in processed_data['member_stats'])
+        'total_respect_gained': processed_data['total_respect'],
+        'payout_totals': payout_totals
     }
 
-    html_content = template.render(context)
-    
     opponent_name_safe = processed_data['opponent_faction_name'].replace(' ', '_').replace('[', '').replace(']', '')
     base_filename = f"war_report_{war_id}_{opponent_name_safe}.html"
     report_path = os.path.join(REPORTS_DIR, base_filename)
-    unique_filename = get_unique_filename(report_path)
+    # Create the file exclusively so a report written in the meantime is never overwritten. A name that
+    # fails is never retried: on case-insensitive filesystems the listing and open() can disagree.
+    tried_names = set()
+    while True:
+        unique_filename = get_unique_filename(report_path, tried_names)
+        try:
+            report_file = open(unique_filename, "xb", buffering=REPORT_WRITE_BUFFER_SIZE)
+            break
+        except FileExistsError:
+            tried_names.add(os.path.basename(unique_filename))
 
-    with open(unique_filename, "w", encoding="utf-8") as f:
-        f.write(html_content)
+    # Stream the rendered template straight to disk instead of building the whole page in memory
+    try:
+        with report_file:
+            template.stream(context).dump(report_file, encoding="utf-8")
+    except Exception:
+        # Don't leave a truncated report behind under the claimed name
+        os.remove(unique_filename)
+        raise
     logging.info(f"Successfully generated {unique_filename}")
 
 
@@ -229,15 +548,6 @@ def main():
     """Main function to generate the war report."""
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
 
-    os.makedirs(CACHE_DIR, exist_ok=True)
-    os.makedirs(REPORTS_DIR, exist_ok=True)
-
-    config = get_config()
-    if not config or not config.get('api_key'):
-        sys.exit(1)
-    
-    API_KEY = config['api_key']
-
     # --- Argument Parsing ---
     parser = argparse.ArgumentParser(
         description="Generate a ranked war report for Torn.com.",
@@ -260,12 +570,22 @@ Usage Examples:
     )
     parser.add_argument('war_id', nargs='?', default=None, help='The ranked war ID. Required for non-interactive mode.')
     parser.add_argument('-p', '--prize-total', type=str, help='The total prize money for the war (e.g., 1000000000).')
-    parser.add_argument('-f', '--faction-share', type=str, help=f"The percentage of the prize the faction keeps. Default: {config['faction_share_default']}%%")
-    parser.add_argument('-g', '--guaranteed-share', type=str, help=f"The percentage of the member pool for guaranteed payouts. Default: {config['guaranteed_share_default']}%%")
-    parser.add_argument('--no-cache', action='store_true', help='Ignore existing cache and fetch fresh attack data from the API.')
+    parser.add_argument('-f', '--faction-share', type=str, help="The percentage of the prize the faction keeps. Default: FactionShare from config.ini, or 30%%")
+    parser.add_argument('-g', '--guaranteed-share', type=str, help="The percentage of the member pool for guaranteed payouts. Default: GuaranteedShare from config.ini, or 10%%")
+    parser.add_argument('--no-cache', action='store_true', help='Ignore existing caches and fetch fresh war, profile and attack data from the API.')
     
     args = parser.parse_args()
 
+    # Only touch the disk after argument parsing so --help works without a config.ini
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+
+    config = get_config()
+    if not config or not config.get('api_key'):
+        sys.exit(1)
+    
+    API_KEY = config['api_key']
+
     # --- Determine Mode (Interactive vs. Argument-driven) ---
     if args.war_id:
         # Argument-driven mode
@@ -283,12 +603,17 @@ Usage Examples:
         guaranteed_share = prompt_for_numeric_input("Guaranteed Share %", default=config['guaranteed_share_default'])
     
     # --- Start processing and API calls ---
-    war_report = get_war_details(war_id, API_KEY)
+    # The war report and the key owner's profile are independent, so fetch them together
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        war_report_future = executor.submit(get_war_details, war_id, API_KEY, use_cache=not args.no_cache)
+        user_data_future = executor.submit(get_user_profile, API_KEY, use_cache=not args.no_cache)
+        war_report = war_report_future.result()
+        user_data = user_data_future.result()
+
     if not war_report or 'rankedwarreport' not in war_report:
         logging.error("Could not fetch war report. Check the War ID and API key.")
         sys.exit(1)
 
-    user_data = get_api_data(f"https://api.torn.com/user/?selections=profile&key={API_KEY}")
     if not user_data or 'faction' not in user_data or user_data['faction']['faction_id'] == 0:
         logging.error("Could not determine your faction ID from the API key provided.")
         sys.exit(1)
@@ -299,28 +624,22 @@ Usage Examples:
     
     # --- Caching logic for attack logs ---
     cache_file_path = os.path.join(CACHE_DIR, f"war_hits_cache_{war_id}.json")
+    fetch_start_time = war_start_time - 330
+    fetch_end_time = war_end_time + 330
     all_attacks = None
 
-    if not args.no_cache and os.path.exists(cache_file_path):
-        logging.info(f"Loading attack data from cache: {cache_file_path}")
-        try:
-            with open(cache_file_path, 'r', encoding='utf-8') as f:
-                all_attacks = json.load(f)
-            logging.info(f"Successfully loaded {len(all_attacks)} unique attacks from cache.")
-        except (json.JSONDecodeError, IOError) as e:
-            logging.warning(f"Could not read cache file {cache_file_path}: {e}. Refetching from API.")
-            all_attacks = None
+    if not args.no_cache:
+        all_attacks = load_attack_cache(cache_file_path, our_faction_id, fetch_start_time, fetch_end_time)
 
     if all_attacks is None:
         logging.info("Cache not found or invalid. Fetching attacks from API...")
-        fetch_start_time = war_start_time - 330
-        fetch_end_time = war_end_time + 330
         all_attacks = get_all_attacks(our_faction_id, fetch_start_time, fetch_end_time, API_KEY)
-        
+        if all_attacks is None:
+            logging.error("Could not fetch the complete attack log. No report was generated.")
+            sys.exit(1)
+
         if all_attacks:
-            logging.info(f"Saving attack data to cache: {cache_file_path}")
-            with open(cache_file_path, 'w', encoding='utf-8') as f:
-                json.dump(all_attacks, f, indent=4)
+            save_attack_cache(cache_file_path, our_faction_id, fetch_start_time, fetch_end_time, all_attacks)
     
     processed_data = process_war_data(war_report, all_attacks, our_faction_id)
 